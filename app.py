@@ -1,17 +1,51 @@
+# eventlet: make the standard library (sockets, sleep, threads) cooperative,
+# so one worker can serve other requests while a request waits on I/O.
+# This has to happen BEFORE anything else is imported.
+import eventlet
+eventlet.monkey_patch()
+
+import os
 from flask import Flask, request, jsonify
-from sqlalchemy.pool import NullPool
+from flask.json.provider import DefaultJSONProvider
+import orjson
+from sqlalchemy import insert, update
+from sqlalchemy.orm import selectinload, raiseload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_sqlalchemy import SQLAlchemy 
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from datetime import datetime
-from payment_service import MockPaymentGateway
+from datetime import datetime, timedelta
+from payment_service import MockPaymentGateway, INVALID_CARD_ERROR
 from flask_socketio import SocketIO, emit
-from textblob import TextBlob
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from datetime import datetime
-import os
+import functools
+import time
 from flask_cors import CORS
 
+# Faster JSON: orjson (written in Rust) instead of Python's built-in json module
+# Every jsonify() call goes through this
+class ORJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        # orjson always writes UTF-8; if someone explicitly asks for ASCII-only, use the built-in encoder
+        if kwargs.get('ensure_ascii'):
+            return super().dumps(obj, **kwargs)
+
+        option = orjson.OPT_NON_STR_KEYS # Allow keys like {1: ...}, same as the built-in json module
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS # Same key order as Flask's default
+        if 'indent' in kwargs:
+            option |= orjson.OPT_INDENT_2 # Pretty output in debug mode
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
 # 1. Configure the Database
@@ -24,11 +58,36 @@ database_url = os.environ.get('DATABASE_URL', 'sqlite:///movies.db')
 if database_url.startswith("postgres://"):
     database_url = database_url.replace("postgres://", "postgresql://", 1)
 
+# psycopg2 talks to Postgres from C, which monkey_patch() can't reach.
+# This makes it hand control back to eventlet while it waits on the database.
+if database_url.startswith("postgresql"):
+    from psycogreen.eventlet import patch_psycopg
+    patch_psycopg()
+
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False # Turns off a warning message
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {"poolclass": NullPool}
-app.config["JWT_SECRET_KEY"] = "super-secret-key"  # Change this in production!
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Keep a pool of open connections so every request doesn't pay for a fresh connect + TLS handshake
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_pre_ping": True, # Test the connection first (Render drops idle connections)
+    "pool_recycle": 1800, # Replace connections older than 30 minutes
+    "insertmanyvalues_page_size": 1000 # Big theaters get split into batches of 1000 rows per INSERT
+}
+# HS256 (HMAC) is the cheapest signature to verify on every protected request.
+# The key must be at least 32 bytes, otherwise PyJWT warns on every token encode/decode.
+app.config["JWT_ALGORITHM"] = "HS256"
+app.config["JWT_SECRET_KEY"] = os.environ.get('JWT_SECRET_KEY', "super-secret-key-change-me-in-production")  # Change this in production!
+# eventlet (patched at the top of this file) lets one worker juggle many requests while they
+# wait on I/O: the database, the payment gateway, Redis
+# If REDIS_URL is set, emits are published to Redis and every socketio worker fans them out to its clients
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode='eventlet',
+    message_queue=os.environ.get('REDIS_URL')
+)
 jwt = JWTManager(app)
 
 # 2. Initialize the Database
@@ -56,41 +115,78 @@ class Movie(db.Model):
     director = db.Column(db.String(100), nullable=False)
     rating = db.Column(db.Float, nullable=True) # e.g., 8.5
 
+    # Relationships (the other side is defined on Showtime/Review with back_populates)
+    showtimes = db.relationship('Showtime', back_populates='movie')
+    reviews = db.relationship('Review', back_populates='movie')
+
     # This is a helper method to print the movie nicely later
     def __repr__(self):
         return f'<Movie {self.title}>'
     
+# Password hashing: Argon2 (memory-hard, and much cheaper per login than Werkzeug's defaults)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False) # unique=True means no duplicate usernames
-    password_hash = db.Column(db.String(512), nullable=False)
+    password_hash = db.Column(db.String(128), nullable=False) # Argon2 hashes are ~100 chars
+
+    bookings = db.relationship('Booking', back_populates='user')
+    reviews = db.relationship('Review', back_populates='user')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Older accounts still have Werkzeug hashes, so fall back to checking those
+        if not self.password_hash.startswith('$argon2'):
+            is_valid = check_password_hash(self.password_hash, password)
+            needs_rehash = True # Upgrade them to Argon2
+        else:
+            try:
+                is_valid = password_hasher.verify(self.password_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False
+            needs_rehash = password_hasher.check_needs_rehash(self.password_hash) # e.g. our settings changed
+
+        # The password is right, so this is our chance to store a fresh hash
+        # (the caller still has to commit)
+        if is_valid and needs_rehash:
+            self.set_password(password)
+        return is_valid
     
 class Theater(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
     location = db.Column(db.String(50), nullable=False)
 
+    showtimes = db.relationship('Showtime', back_populates='theater')
+    # A theater can have hundreds of seats: never load them by accident, query them explicitly
+    seats = db.relationship('Seat', back_populates='theater', lazy='raise')
+
 class Showtime(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     show_time = db.Column(db.DateTime, nullable=False)
     price = db.Column(db.Float, nullable=False, default=10.0)
     
     # Foreign Keys: These link to the other tables
-    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False, index=True) # index: we look up showtimes by movie
     theater_id = db.Column(db.Integer, db.ForeignKey('theater.id'), nullable=False)
     
     # Relationships: These help us access the related objects easily in Python
     # e.g., showtime.movie.title
-    movie = db.relationship('Movie', backref=db.backref('showtimes', lazy=True))
-    theater = db.relationship('Theater', backref=db.backref('showtimes', lazy=True))
+    # Queries that need the theater ask for it explicitly (see get_movie_showtimes: selectinload)
+    movie = db.relationship('Movie', back_populates='showtimes')
+    theater = db.relationship('Theater', back_populates='showtimes')
+    # Can be hundreds of rows: never load them by accident
+    bookings = db.relationship('Booking', back_populates='showtime', lazy='raise')
 
 class Seat(db.Model):
+    # Index for the "does this seat exist in this theater?" lookup on every booking
+    __table_args__ = (
+        db.Index('ix_seat_theater_code', 'theater_id', 'code'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     row = db.Column(db.String(5), nullable=False)   # e.g., "A"
     number = db.Column(db.Integer, nullable=False)  # e.g., 1
@@ -98,22 +194,36 @@ class Seat(db.Model):
     
     # Foreign Key
     theater_id = db.Column(db.Integer, db.ForeignKey('theater.id'), nullable=False)
-    theater = db.relationship('Theater', backref=db.backref('seats', lazy=True))
+    theater = db.relationship('Theater', back_populates='seats')
 
     def __repr__(self):
         return f'<Seat {self.code}>'
 
 class Booking(db.Model):
+    # A seat can only be booked once per showtime (enforced by the database itself)
+    # The unique index also serves our (showtime_id, seat_code) lookups
+    # (Older databases get it from upgrade_schema() below)
+    __table_args__ = (
+        db.Index('uq_showtime_seat', 'showtime_id', 'seat_code', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     seat_code = db.Column(db.String(10), nullable=False) # e.g., "A1"
+
+    # Payment tracking: a booking is 'pending' while we wait for the payment, then 'confirmed'
+    # A 'pending' row that stays around means the worker died mid-payment (see release_stale_reservation)
+    status = db.Column(db.String(10), nullable=False, default='confirmed')
+    reserved_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+    transaction_id = db.Column(db.String(20), nullable=True) # The payment "receipt", e.g. "txn_1a2b3c4d5e"
     
     # Foreign Keys
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     showtime_id = db.Column(db.Integer, db.ForeignKey('showtime.id'), nullable=False)
     
     # Relationships
-    user = db.relationship('User', backref=db.backref('bookings', lazy=True))
-    showtime = db.relationship('Showtime', backref=db.backref('bookings', lazy=True))
+    # lazy='raise': booking.user must be loaded explicitly (e.g. with joinedload), never by accident
+    user = db.relationship('User', back_populates='bookings', lazy='raise')
+    showtime = db.relationship('Showtime', back_populates='bookings')
 
 class Review(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -127,8 +237,112 @@ class Review(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False)
     
-    user = db.relationship('User', backref=db.backref('reviews', lazy=True))
-    movie = db.relationship('Movie', backref=db.backref('reviews', lazy=True))
+    user = db.relationship('User', back_populates='reviews')
+    movie = db.relationship('Movie', back_populates='reviews')
+
+# Startup: Bring tables created by older versions of the app up to date
+# db.create_all() never changes an existing table, and /setup-db deletes all data,
+# so anything new an existing table needs is added here (safe to run every time)
+def upgrade_schema():
+    with app.app_context():
+        try:
+            if not db.inspect(db.engine).has_table('booking'):
+                return # Fresh database: /setup-db will create everything
+            booking_columns = {column['name'] for column in db.inspect(db.engine).get_columns('booking')}
+            with db.engine.begin() as conn:
+                # Payment tracking columns (old rows were all paid for, so they count as 'confirmed')
+                if 'status' not in booking_columns:
+                    conn.execute(db.text("ALTER TABLE booking ADD COLUMN status VARCHAR(10) NOT NULL DEFAULT 'confirmed'"))
+                if 'reserved_at' not in booking_columns:
+                    conn.execute(db.text("ALTER TABLE booking ADD COLUMN reserved_at TIMESTAMP"))
+                if 'transaction_id' not in booking_columns:
+                    conn.execute(db.text("ALTER TABLE booking ADD COLUMN transaction_id VARCHAR(20)"))
+                # book_ticket's "ON CONFLICT DO NOTHING" needs this unique index
+                conn.execute(db.text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS uq_showtime_seat ON booking (showtime_id, seat_code)"
+                ))
+        except Exception:
+            # e.g. duplicate bookings already in the table: log it, but let the app start
+            app.logger.exception("Could not upgrade the database schema")
+
+upgrade_schema()
+
+# NLP: VADER sentiment analyzer
+# Built once at startup. Its lexicon is a plain Python dict, so scoring is just fast word lookups
+_sia = SentimentIntensityAnalyzer()
+_sia.polarity_scores("warmup") # Warm it up now, so the first real review isn't slower than the rest
+
+# Helper: Sentiment score for a review text
+# Cached, so the same text never has to be analyzed twice
+@functools.lru_cache(maxsize=4096)
+def _polarity(text):
+    # 'compound' is a float between -1.0 (Negative) and 1.0 (Positive)
+    return _sia.polarity_scores(text)['compound']
+
+# Helper: Let the current transaction commit without waiting for the disk (Postgres only)
+# Fine for reviews: in a crash we might lose the last few, but the database never gets corrupted
+def skip_commit_fsync():
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text("SET LOCAL synchronous_commit = off"))
+
+# Background Task: Score reviews in small batches after the response has been sent
+# add_review drops (review_id, text) into this queue; one background worker empties it
+# create_queue() gives a queue that matches socketio's async mode (an eventlet green queue),
+# so waiting on it never blocks other requests
+REVIEW_BATCH_SIZE = 32   # Score at most 32 reviews per batch
+REVIEW_BATCH_WAIT = 0.05 # Collect reviews for up to 50ms before scoring
+_pending_reviews = socketio.server.eio.create_queue()
+_QueueEmpty = socketio.server.eio.get_queue_empty_exception()
+
+def queue_review_for_scoring(review_id, text):
+    _pending_reviews.put((review_id, text))
+
+def queue_unscored_reviews():
+    # The queue lives in memory, so anything still waiting is lost on a restart/deploy.
+    # Pick those reviews up again from the DB (they still have sentiment_score = NULL)
+    with app.app_context():
+        try:
+            rows = db.session.execute(
+                db.select(Review.id, Review.text).where(Review.sentiment_score.is_(None))
+            ).all()
+        except Exception:
+            # e.g. the tables don't exist yet (before /setup-db)
+            db.session.rollback()
+            app.logger.exception("Could not load unscored reviews")
+            return
+    for review_id, text in rows:
+        queue_review_for_scoring(review_id, text)
+
+def review_scorer():
+    # Runs forever on socketio's worker (eventlet green thread), so the client doesn't wait for the NLP
+    queue_unscored_reviews()
+    while True:
+        # Sleep until the first review arrives, then collect more for up to REVIEW_BATCH_WAIT
+        batch = [_pending_reviews.get()]
+        deadline = time.monotonic() + REVIEW_BATCH_WAIT
+        try:
+            while len(batch) < REVIEW_BATCH_SIZE:
+                batch.append(_pending_reviews.get(timeout=max(deadline - time.monotonic(), 0)))
+        except _QueueEmpty:
+            pass
+
+        with app.app_context():
+            try:
+                scores = [
+                    {'id': review_id, 'sentiment_score': _polarity(text)}
+                    for review_id, text in batch
+                ]
+                # ONE bulk UPDATE for the whole batch, instead of one per review
+                skip_commit_fsync()
+                db.session.execute(update(Review), scores)
+                db.session.commit()
+            except Exception:
+                # Log and keep going: one bad batch must not stop scoring for the whole process
+                db.session.rollback()
+                app.logger.exception("Failed to score %d reviews", len(batch))
+
+# Start the scorer once per process, at startup
+socketio.start_background_task(review_scorer)
 
 @app.route('/')
 def home():
@@ -140,21 +354,19 @@ def home():
 def add_seats_to_theater(theater_id):
     # Data: { "rows": ["A", "B"], "seats_per_row": 5 }
     data = request.get_json()
-    theater = Theater.query.get_or_404(theater_id)
-    
-    created_seats = []
-    for row in data['rows']:
-        for num in range(1, data['seats_per_row'] + 1):
-            code = f"{row}{num}" # A1, A2...
-            new_seat = Seat(
-                row=row,
-                number=num,
-                code=code,
-                theater_id=theater.id
-            )
-            db.session.add(new_seat)
-            created_seats.append(code)
-            
+    theater = db.get_or_404(Theater, theater_id)
+    
+    # Build every seat as a plain dict first, then send them all in ONE bulk INSERT
+    # (much faster than calling db.session.add() once per seat)
+    rows_to_insert = [
+        {'row': row, 'number': num, 'code': f"{row}{num}", 'theater_id': theater.id} # A1, A2...
+        for row in data['rows']
+        for num in range(1, data['seats_per_row'] + 1)
+    ]
+    created_seats = [seat['code'] for seat in rows_to_insert]
+
+    if rows_to_insert:
+        db.session.execute(insert(Seat), rows_to_insert)
     db.session.commit()
     return jsonify({'message': f'Created {len(created_seats)} seats for {theater.name}', 'seats': created_seats}), 201
 
@@ -182,19 +394,14 @@ def add_movie():
 # Endpoint 2: READ all movies
 @app.route('/movies', methods=['GET'])
 def get_movies():
-    # 1. Query the database for all movies
-    movies = Movie.query.all()
-    
-    # 2. Convert the list of objects into a list of dictionaries (JSON)
-    output = []
-    for movie in movies:
-        movie_data = {
-            'id': movie.id,
-            'title': movie.title,
-            'director': movie.director,
-            'rating': movie.rating
-        }
-        output.append(movie_data)
+    # 1. Query the database for just the 4 columns we need
+    # (plain rows instead of full Movie objects, so SQLAlchemy skips building ORM instances)
+    rows = db.session.execute(
+        db.select(Movie.id, Movie.title, Movie.director, Movie.rating)
+    ).all()
+
+    # 2. Convert the rows into a list of dictionaries (JSON)
+    output = [dict(row._mapping) for row in rows]
 
     # 3. Return the list
     return jsonify({'movies': output})
@@ -228,6 +435,10 @@ def login():
 
     # 2. Check if user exists AND password is correct
     if user and user.check_password(data.get('password')):
+        # check_password may have upgraded an old password hash: save it
+        if db.session.is_modified(user):
+            db.session.commit()
+
         # 3. Create a new token
         access_token = create_access_token(identity=str(user.id))
         return jsonify({'access_token': access_token}), 200
@@ -267,11 +478,18 @@ def create_showtime():
 @app.route('/movies/<int:movie_id>/showtimes', methods=['GET'])
 def get_movie_showtimes(movie_id):
     # 1. Find the movie first (just to make sure it exists)
-    movie = Movie.query.get_or_404(movie_id)
+    movie = db.get_or_404(Movie, movie_id)
 
     # 2. Find all showtimes for this movie
-    # We can access 'movie.showtimes' automatically because of the relationship we defined!
-    showtimes = movie.showtimes 
+    # selectinload grabs all the theaters in ONE extra query, instead of one query per showtime (N+1 problem)
+    loader_options = [selectinload(Showtime.theater)]
+    if app.debug:
+        # In debug mode, any other lazy load raises an error so new N+1 queries get caught early
+        loader_options.append(raiseload('*'))
+
+    showtimes = db.session.execute(
+        db.select(Showtime).options(*loader_options).filter_by(movie_id=movie_id)
+    ).scalars().all()
     
     output = []
     for show in showtimes:
@@ -288,6 +506,47 @@ def get_movie_showtimes(movie_id):
         'showtimes': output
     })
 
+# A payment never takes this long, so an older 'pending' booking was abandoned
+# (e.g. the worker was killed or redeployed in the middle of the payment)
+STALE_RESERVATION_AGE = timedelta(minutes=10)
+
+# Helper: Reserve a seat for this user
+# "ON CONFLICT DO NOTHING" lets the database decide who gets the seat in one step,
+# so two users can never book the same seat at the same time
+# Returns the new booking's id, or None if the seat is already taken
+def reserve_seat(user_id, showtime_id, seat_code):
+    seat_insert = pg_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+    stmt = seat_insert(Booking).values(
+        user_id=user_id,
+        showtime_id=showtime_id,
+        seat_code=seat_code,
+        status='pending'
+    ).on_conflict_do_nothing(
+        index_elements=['showtime_id', 'seat_code']
+    ).returning(Booking.id)
+
+    booking_id = db.session.execute(stmt).scalar()
+    db.session.commit()
+    return booking_id
+
+# Helper: Free the seat if it is only held by an abandoned, never-paid reservation
+# Returns True if a stale reservation was removed
+def release_stale_reservation(showtime_id, seat_code):
+    result = db.session.execute(db.delete(Booking).where(
+        Booking.showtime_id == showtime_id,
+        Booking.seat_code == seat_code,
+        Booking.status == 'pending',
+        Booking.reserved_at < datetime.utcnow() - STALE_RESERVATION_AGE
+    ))
+    db.session.commit()
+    return result.rowcount > 0
+
+# Helper: Give a reserved seat back (the booking was never paid for)
+def release_seat(booking_id):
+    db.session.rollback() # In case the error left the session in a broken state
+    db.session.execute(db.delete(Booking).where(Booking.id == booking_id))
+    db.session.commit()
+
 # Endpoint 8: Book a Ticket (Protected & Paid)
 @app.route('/bookings', methods=['POST'])
 @jwt_required()
@@ -295,59 +554,75 @@ def book_ticket():
     current_user_id = get_jwt_identity()
     data = request.get_json()
 
-    # Fetch the specific showtime to get its price
-    showtime = Showtime.query.get(data['showtime_id'])
+    # Fetch the showtime's price AND check the seat exists in its theater, in ONE query
+    # (whether the seat is already booked is decided by the INSERT below)
+    seat_ok = db.exists().where(
+        Seat.theater_id == Showtime.theater_id,
+        Seat.code == data['seat_code']
+    ).label('seat_ok')
+    showtime = db.session.execute(
+        db.select(Showtime.price, seat_ok).where(Showtime.id == data['showtime_id'])
+    ).first()
     
     # Check if showtime exists (good safety practice)
     if not showtime:
         return jsonify({'message': 'Showtime not found'}), 404
 
     # Does this seat exist in this theater?
-    seat_exists = Seat.query.filter_by(
-        theater_id=showtime.theater_id, 
-        code=data['seat_code']
-    ).first()
-
-    if not seat_exists:
+    if not showtime.seat_ok:
         return jsonify({'message': f"Seat {data['seat_code']} does not exist in this theater!"}), 400
+
+    # We expect the user to send 'card_details' in the JSON body
+    # Check the card BEFORE reserving, so a bad card never touches the DB or blocks the seat
+    card_info = data.get('card_details', {})
+    card_number = card_info.get('number') if isinstance(card_info, dict) else None
+    if not MockPaymentGateway.is_valid_card_number(card_number):
+        return jsonify({
+            'message': 'Payment Failed',
+            'error': INVALID_CARD_ERROR
+        }), 400
     
-    # 1. Validation: Check if seat is free
-    existing_booking = Booking.query.filter_by(
-        showtime_id=data['showtime_id'], 
-        seat_code=data['seat_code']
-    ).first()
-    
-    if existing_booking:
+    # 1. Reserve the seat (as 'pending' until the payment goes through)
+    booking_id = reserve_seat(current_user_id, data['showtime_id'], data['seat_code'])
+
+    # Taken? If it's only held by an abandoned reservation, free it and try once more
+    # (This only runs when there's a conflict, so normal bookings don't pay for it)
+    if booking_id is None and release_stale_reservation(data['showtime_id'], data['seat_code']):
+        booking_id = reserve_seat(current_user_id, data['showtime_id'], data['seat_code'])
+
+    # No row came back = someone else already has this seat
+    if booking_id is None:
         return jsonify({'message': 'Sorry, that seat is already booked!'}), 400
     
     # 2. PAYMENT PROCESSING (The New Step)
-    # We expect the user to send 'card_details' in the JSON body
-    card_info = data.get('card_details', {})
-
     price = showtime.price
     
-    payment_response = MockPaymentGateway.process_payment(card_info, price)
+    try:
+        payment_response = MockPaymentGateway.process_payment(card_info, price, sleep=socketio.sleep)
+    except Exception:
+        # Something crashed mid-payment: release the seat, then let Flask report the error
+        release_seat(booking_id)
+        raise
     
     if not payment_response['success']:
-        # If payment fails, STOP. Do not book the seat.
+        # If payment fails, STOP. Release the seat we reserved.
+        release_seat(booking_id)
         return jsonify({
             'message': 'Payment Failed',
             'error': payment_response['error']
         }), 400
 
-    # 3. Create the booking (Only if payment worked)
-    new_booking = Booking(
-        user_id=current_user_id,
-        showtime_id=data['showtime_id'],
-        seat_code=data['seat_code']
-        # Ideally, we would also save the payment_response['transaction_id'] here!
+    # 3. Payment worked: confirm the booking and save the receipt
+    db.session.execute(
+        db.update(Booking)
+        .where(Booking.id == booking_id)
+        .values(status='confirmed', transaction_id=payment_response['transaction_id'])
     )
-    
-    db.session.add(new_booking)
     db.session.commit()
 
     # BROADCAST UPDATE
     # "broadcast=True" means send to everyone, not just the person who booked
+    # (With a Redis message queue this is just a quick publish; the socketio workers do the sending)
     socketio.emit('seat_booked', {
         'showtime_id': data['showtime_id'],
         'seat_code': data['seat_code']
@@ -355,7 +630,7 @@ def book_ticket():
     
     return jsonify({
         'message': 'Booking confirmed!', 
-        'booking_id': new_booking.id,
+        'booking_id': booking_id,
         'transaction_id': payment_response['transaction_id'] # Send receipt to user
     }), 201
 
@@ -366,33 +641,29 @@ def add_review():
     current_user_id = get_jwt_identity()
     data = request.get_json()
     
-    # 1. Run NLP Analysis
-    # We pass the text into TextBlob
-    blob = TextBlob(data['text'])
-    
-    # .sentiment.polarity returns a float between -1.0 (Negative) and 1.0 (Positive)
-    polarity = blob.sentiment.polarity
-    
-    # 2. Create the Review Object
+    # 1. Create the Review Object
+    # The score is filled in later by the background task
     new_review = Review(
         user_id=current_user_id,
         movie_id=data['movie_id'],
         text=data['text'],
         rating=data['rating'],
-        sentiment_score=polarity # <--- Saving the AI score
+        sentiment_score=None
     )
     
+    skip_commit_fsync()
     db.session.add(new_review)
     db.session.commit()
+
+    # 2. Run NLP Analysis in the background (don't make the user wait for it)
+    queue_review_for_scoring(new_review.id, new_review.text)
     
-    # 3. Return the result (Fun to see what the AI thought!)
+    # 3. Return right away. 202 = "Accepted, still processing"
     return jsonify({
         'message': 'Review added!',
-        'sentiment_analysis': {
-            'score': polarity,
-            'verdict': 'Positive' if polarity > 0 else 'Negative'
-        }
-    }), 201
+        'review_id': new_review.id,
+        'sentiment_analysis': 'pending'
+    }), 202
 
 if __name__ == '__main__':
     socketio.run(app, debug=True)
\ No newline at end of file
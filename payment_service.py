@@ -1,7 +1,12 @@
 import time
-import uuid
+import secrets
 import random
 
+# Luhn lookup: what a digit becomes after "double it, subtract 9 if > 9"
+_LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+INVALID_CARD_ERROR = 'Invalid Card Number: Must be 16 digits and pass the Luhn check.'
+
 class MockPaymentGateway:
     """
     A service that simulates a real Payment Gateway (like Stripe or Razorpay).
@@ -9,26 +14,45 @@ class MockPaymentGateway:
     """
 
     @staticmethod
-    def process_payment(card_details, amount):
+    def is_valid_card_number(card_number):
+        """
+        Checks that the card number is 16 digits and passes the Luhn checksum.
+        Accepts a str, int or bytes.
+        """
+        buf = card_number if isinstance(card_number, bytes) else str(card_number).encode()
+        # bytes.isdigit() only accepts ASCII 0-9
+        if len(buf) != 16 or not buf.isdigit():
+            return False
+
+        # Luhn: starting from the right, every second digit is doubled
+        # (ord('0') == 48, so "b - 48" turns a byte into its digit)
+        total = sum(b - 48 for b in buf[-1::-2]) + sum(_LUHN_DOUBLED[b - 48] for b in buf[-2::-2])
+        return total % 10 == 0
+
+    @staticmethod
+    def process_payment(card_details, amount, sleep=time.sleep):
         """
         Simulates processing a payment.
+        Pass a cooperative 'sleep' (e.g. socketio.sleep) so the worker can serve
+        other requests while we wait on the "bank".
         Returns a dictionary: {'success': Bool, 'transaction_id': Str, 'error': Str}
         """
         
-        # 1. Simulate Network Latency
-        # Real HTTP requests to banks take 1-3 seconds.
-        print(f"Connecting to Bank Server... Processing ${amount}...")
-        time.sleep(2) 
-
-        # 2. Input Validation (Basic Security)
-        # Real gateways check Luhn algorithms, etc. We'll just check length.
+        # 1. Input Validation (Basic Security)
+        # Done BEFORE talking to the bank, so bad cards are rejected instantly.
+        # Real gateways check Luhn algorithms, and so do we.
         card_number = card_details.get('number', '')
-        if len(str(card_number)) != 16:
+        if not MockPaymentGateway.is_valid_card_number(card_number):
             return {
                 'success': False,
-                'error': 'Invalid Card Number: Must be 16 digits.'
+                'error': INVALID_CARD_ERROR
             }
 
+        # 2. Simulate Network Latency
+        # Real HTTP requests to banks take 1-3 seconds.
+        print(f"Connecting to Bank Server... Processing ${amount}...")
+        sleep(2)
+
         # 3. Simulate "Business Logic" Failures
         # Sometimes banks reject cards (Insufficient funds, Fraud detection).
         # We'll simulate a random failure 10% of the time.
@@ -40,7 +64,7 @@ class MockPaymentGateway:
 
         # 4. Success! Generate a Transaction ID
         # This is the "Receipt" or "Reference Number" crucial for tracking.
-        transaction_id = f"txn_{uuid.uuid4().hex[:10]}"
+        transaction_id = f"txn_{secrets.token_hex(5)}" # 5 random bytes = 10 hex chars
         
         return {
             'success': True,